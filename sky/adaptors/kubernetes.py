@@ -12,6 +12,7 @@ kubernetes = None
 urllib3 = None
 
 _configured = False
+_api_client = None
 _core_api = None
 _auth_api = None
 _networking_api = None
@@ -21,6 +22,12 @@ _node_api = None
 # Timeout to use for API calls
 API_TIMEOUT = 5
 
+# Maximum number of connections kept open to the API server. Should be at
+# least the number of threads making API calls in parallel, e.g., through
+# subprocess_utils.run_in_parallel, so that they do not wait on each other
+# or open and discard connections.
+CONNECTION_POOL_MAXSIZE = 32
+
 
 def import_package(func):
 
@@ -88,22 +95,52 @@ def _load_config():
     _configured = True
 
 
+@import_package
+def _get_api_client():
+    """Returns the ApiClient shared by all API objects.
+
+    Sharing one client lets all API objects reuse the same pool of
+    keep-alive connections to the API server. It must not be passed to
+    stream(), which would reroute calls made by all API objects over the
+    websocket while the exec runs; use stream_core_api() instead.
+    """
+    global _api_client
+    if _api_client is None:
+        _load_config()
+        configuration = kubernetes.client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = max(
+            configuration.connection_pool_maxsize, CONNECTION_POOL_MAXSIZE)
+        _api_client = kubernetes.client.ApiClient(configuration)
+    return _api_client
+
+
 @import_package
 def core_api():
     global _core_api
     if _core_api is None:
-        _load_config()
-        _core_api = kubernetes.client.CoreV1Api()
+        _core_api = kubernetes.client.CoreV1Api(_get_api_client())
 
     return _core_api
 
 
+@import_package
+def stream_core_api():
+    """Returns a new CoreV1Api on its own ApiClient, for use with stream().
+
+    stream() temporarily replaces the ApiClient's call_api with a websocket
+    wrapper and is not thread-safe. Use a new client for every exec so that
+    concurrent execs do not leave the wrapper installed, and other API calls
+    never go over the websocket.
+    """
+    _load_config()
+    return kubernetes.client.CoreV1Api(kubernetes.client.ApiClient())
+
+
 @import_package
 def auth_api():
     global _auth_api
     if _auth_api is None:
-        _load_config()
-        _auth_api = kubernetes.client.RbacAuthorizationV1Api()
+        _auth_api = kubernetes.client.RbacAuthorizationV1Api(_get_api_client())
 
     return _auth_api
 
@@ -112,8 +149,7 @@ def auth_api():
 def networking_api():
     global _networking_api
     if _networking_api is None:
-        _load_config()
-        _networking_api = kubernetes.client.NetworkingV1Api()
+        _networking_api = kubernetes.client.NetworkingV1Api(_get_api_client())
 
     return _networking_api
 
@@ -122,8 +158,8 @@ def networking_api():
 def custom_objects_api():
     global _custom_objects_api
     if _custom_objects_api is None:
-        _load_config()
-        _custom_objects_api = kubernetes.client.CustomObjectsApi()
+        _custom_objects_api = kubernetes.client.CustomObjectsApi(
+            _get_api_client())
 
     return _custom_objects_api
 
@@ -132,8 +168,7 @@ def custom_objects_api():
 def node_api():
     global _node_api
     if _node_api is None:
-        _load_config()
-        _node_api = kubernetes.client.NodeV1Api()
+        _node_api = kubernetes.client.NodeV1Api(_get_api_client())
 
     return _node_api
 
@@ -155,4 +190,14 @@ def max_retry_error():
 
 @import_package
 def stream():
+    """Returns kubernetes.stream.stream.
+
+    The API method passed to it must come from stream_core_api(), not from
+    core_api(), whose ApiClient is shared by all API objects.
+    """
     return kubernetes.stream.stream
+
+
+@import_package
+def watch():
+    return kubernetes.watch
@@ -242,7 +242,7 @@ def _wait_for_pods_to_run(namespace, new_nodes):
 
 def _run_command_on_pods(node_name, node_namespace, command):
     cmd_output = kubernetes.stream()(
-        kubernetes.core_api().connect_get_namespaced_pod_exec,
+        kubernetes.stream_core_api().connect_get_namespaced_pod_exec,
         node_name,
         node_namespace,
         command=command,
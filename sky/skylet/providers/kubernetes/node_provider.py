@@ -2,8 +2,10 @@ import copy
 import logging
 import os
 import re
+import shutil
+import tempfile
 import time
-from typing import Dict
+from typing import Any, Dict, Tuple
 from uuid import uuid4
 
 from ray.autoscaler._private.command_runner import SSHCommandRunner
@@ -20,15 +22,112 @@ from sky.skylet import constants
 from sky.skylet.providers.kubernetes import config
 from sky.utils import cluster_yaml_utils
 from sky.utils import common_utils
+from sky.utils import subprocess_utils
 
 logger = logging.getLogger(__name__)
 
 MAX_TAG_RETRIES = 3
 DELAY_BEFORE_TAG_RETRY = 0.5
 UPTIME_SSH_TIMEOUT = 10
+# Seconds for which a head node's SSH NodePort lookup is cached.
+HEAD_SSH_PORT_CACHE_TTL = 30
+# Seconds for which the result of a non-terminated pod listing is cached.
+NON_TERMINATED_PODS_CACHE_TTL = 2
+# Seconds for which a pod read is reused by the per-node accessors.
+POD_READ_CACHE_TTL = 1
+# Passed as resource_version to list calls to serve them from the API
+# server's watch cache instead of a quorum read from etcd. The results may
+# be slightly stale, which is fine for the polling done here.
+LIST_FROM_CACHE_RESOURCE_VERSION = '0'
+# Seconds after which a pod watch without its own timeout is re-established.
+POD_WATCH_TIMEOUT = 60
+# Extra seconds on top of the server-side watch timeout before the client
+# gives up on the watch connection, e.g., if it was silently dropped.
+POD_WATCH_CLIENT_TIMEOUT_MARGIN = 5
+# Delays in seconds between pod status polls. The delay starts small so that
+# quickly scheduled pods are noticed early, and doubles up to the maximum.
+POD_POLL_INITIAL_DELAY = 0.05
+POD_POLL_MAX_DELAY = 1
+
+# Default maximum number of API calls, e.g., pod creations, execs or
+# deletions, issued in parallel, to avoid overloading the API server. Can be
+# overridden with 'max_parallel_api_calls' in the provider config, and is
+# capped at the API client's connection pool size.
+DEFAULT_MAX_PARALLEL_API_CALLS = 16
 
 RAY_COMPONENT_LABEL = 'cluster.ray.io/component'
 
+# Node selector label keys used to request GPUs, one per label formatter.
+GPU_LABEL_KEYS = frozenset(
+    lf.get_label_key() for lf in kubernetes_utils.LABEL_FORMATTER_REGISTRY)
+
+# Markers printed by the pod setup script to report its results.
+PRIVILEGE_CHECK_MARKER = '::PRIVILEGE_CHECK::'
+SSH_USER_MARKER = '::SSH_USER::'
+# POSIX-style user names, e.g., 'ubuntu', 'ec2-user' or 'first.last'.
+SSH_USER_PATTERN = r'[A-Za-z_][A-Za-z0-9_.-]*'
+INSUFFICIENT_PRIVILEGES_OUTPUT = (
+    f'{PRIVILEGE_CHECK_MARKER}{exceptions.INSUFFICIENT_PRIVILEGES_CODE}')
+
+# Checks if the default user has sufficient privilege to set up
+# the kubernetes instance pod. Exits early if not.
+CHECK_K8S_USER_SUDO_CMD = (
+    'if [ $(id -u) -eq 0 ]; then'
+    # If user is root, create an alias for sudo used in skypilot setup
+    '  echo \'alias sudo=""\' >> ~/.bashrc; '
+    'else '
+    '  if command -v sudo >/dev/null 2>&1; then '
+    '    timeout 2 sudo -l >/dev/null 2>&1 || '
+    f'    {{ echo {INSUFFICIENT_PRIVILEGES_OUTPUT}; exit; }}; '
+    '  else '
+    f'    {{ echo {INSUFFICIENT_PRIVILEGES_OUTPUT}; exit; }}; '
+    '  fi; '
+    'fi; ')
+
+# Captures env vars from the pod's runtime to /etc/profile.d/. See
+# KubernetesNodeProvider._setup_pods for details.
+SET_K8S_ENV_VAR_CMD = (
+    '{ printenv | awk -F "=" \'{print "export " $1 "=\\047" $2 "\\047"}\' > ~/k8s_env_var.sh && '
+    'mv ~/k8s_env_var.sh /etc/profile.d/k8s_env_var.sh || '
+    '$(prefix_cmd) mv ~/k8s_env_var.sh /etc/profile.d/k8s_env_var.sh; }; ')
+
+# Setting up ssh for the pod instance. This is already setup for
+# the jump pod so it does not need to be run for it.
+SET_K8S_SSH_CMD = (
+    'export DEBIAN_FRONTEND=noninteractive;'
+    '$(prefix_cmd) apt-get update;'
+    '$(prefix_cmd) apt install openssh-server rsync -y; '
+    '$(prefix_cmd) mkdir -p /var/run/sshd; '
+    '$(prefix_cmd) sed -i "s/PermitRootLogin prohibit-password/PermitRootLogin yes/" /etc/ssh/sshd_config; '
+    '$(prefix_cmd) sed "s@session\\s*required\\s*pam_loginuid.so@session optional pam_loginuid.so@g" -i /etc/pam.d/sshd; '
+    'cd /etc/ssh/ && $(prefix_cmd) ssh-keygen -A; '
+    '$(prefix_cmd) mkdir -p ~/.ssh; '
+    '$(prefix_cmd) cat /etc/secret-volume/ssh-publickey* > ~/.ssh/authorized_keys; '
+    '$(prefix_cmd) service ssh restart; ')
+
+GET_K8S_SSH_USER_CMD = f'echo {SSH_USER_MARKER}$(whoami)'
+
+# Defines prefix_cmd, which prints "sudo" if the user is not root.
+PREFIX_CMD_FUNC = ('prefix_cmd() { if [ $(id -u) -ne 0 ]; then echo "sudo"; '
+                   'else echo ""; fi; }; ')
+
+# Checks privileges, sets env vars and prints the ssh user. These steps are
+# fast, so they share one exec that finishes within kubernetes.API_TIMEOUT.
+CONFIGURE_K8S_POD_CMD = [
+    '/bin/sh', '-c',
+    (f'{PREFIX_CMD_FUNC}'
+     f'{CHECK_K8S_USER_SUDO_CMD}'
+     f'{SET_K8S_ENV_VAR_CMD}'
+     f'{GET_K8S_SSH_USER_CMD}')
+]
+
+# Installing the SSH server may outlast kubernetes.API_TIMEOUT, which cuts
+# off the exec's output, so it runs in its own exec.
+INSTALL_K8S_SSH_CMD = [
+    '/bin/sh', '-c', (f'{PREFIX_CMD_FUNC}'
+                      f'{SET_K8S_SSH_CMD}')
+]
+
 
 # Monkey patch SSHCommandRunner to allow specifying SSH port
 def set_port(self, port):
@@ -71,17 +170,14 @@ def head_service_selector(cluster_name: str) -> Dict[str, str]:
 
 
 def to_label_selector(tags):
-    label_selector = ''
-    for k, v in tags.items():
-        if label_selector != '':
-            label_selector += ','
-        label_selector += '{}={}'.format(k, v)
-    return label_selector
+    return ','.join(f'{k}={v}' for k, v in tags.items())
 
 
 def run_command_on_pods(node_name, node_namespace, command):
+    # Use a separate client per exec, since this is called from multiple
+    # threads and stream() is not thread-safe.
     cmd_output = kubernetes.stream()(
-        kubernetes.core_api().connect_get_namespaced_pod_exec,
+        kubernetes.stream_core_api().connect_get_namespaced_pod_exec,
         node_name,
         node_namespace,
         command=command,
@@ -93,6 +189,71 @@ def run_command_on_pods(node_name, node_namespace, command):
     return cmd_output
 
 
+class _PodWatchError(Exception):
+    """Raised when a pod watch fails, e.g., due to a dropped connection."""
+    pass
+
+
+def _is_pod_scheduled(pod):
+    # If container_statuses is None, then the pod hasn't
+    # been scheduled yet.
+    return (pod.status.phase != 'Pending' or
+            pod.status.container_statuses is not None)
+
+
+def _is_pod_running(pod):
+    """Returns whether the pod and all its containers are running.
+
+    Raises:
+      config.KubernetesError: if a container of the pod failed to be created.
+    """
+    # If container_statuses is None, then the pod hasn't
+    # been scheduled yet.
+    if pod.status.container_statuses is None:
+        return False
+    # The pod is ready if it and all the containers within the
+    # pod are succesfully created and running.
+    if pod.status.phase == 'Running' and all([
+            container.state.running
+            for container in pod.status.container_statuses
+    ]):
+        return True
+
+    if pod.status.phase == 'Pending':
+        # Iterate over each container in pod to check their status
+        for container_status in pod.status.container_statuses:
+            # If the container wasn't in 'ContainerCreating'
+            # state, then we know pod wasn't scheduled or
+            # had some other error, such as image pull error.
+            # See list of possible reasons for waiting here:
+            # https://stackoverflow.com/a/57886025
+            waiting = container_status.state.waiting
+            if waiting is not None and waiting.reason != 'ContainerCreating':
+                raise config.KubernetesError(
+                    'Failed to create container while launching '
+                    'the node. Error details: '
+                    f'{container_status.state.waiting.message}.')
+    return False
+
+
+def parse_ssh_user(output):
+    """Parses the ssh user printed by CONFIGURE_K8S_POD_CMD.
+
+    Raises:
+      config.KubernetesError: if the output has no valid ssh user, e.g.,
+        because it was cut off before the marker.
+    """
+    if SSH_USER_MARKER not in output:
+        raise config.KubernetesError(
+            'Failed to fetch the ssh user from the pod. '
+            f'Output: {output!r}')
+    ssh_user = output.rsplit(SSH_USER_MARKER, 1)[-1].strip()
+    if re.fullmatch(SSH_USER_PATTERN, ssh_user) is None:
+        raise config.KubernetesError(
+            f'Invalid ssh user {ssh_user!r} fetched from the pod.')
+    return ssh_user
+
+
 class KubernetesNodeProvider(NodeProvider):
 
     def __init__(self, provider_config, cluster_name):
@@ -110,7 +271,61 @@ class KubernetesNodeProvider(NodeProvider):
         # kubernetes setups.
         self.timeout = provider_config['timeout']
 
+        self.max_parallel_api_calls = max(
+            1,
+            min(
+                provider_config.get('max_parallel_api_calls',
+                                    DEFAULT_MAX_PARALLEL_API_CALLS),
+                kubernetes.CONNECTION_POOL_MAXSIZE))
+
+        # Cache of head SSH NodePorts, keyed by cluster name. Values are
+        # (lookup time, port) tuples.
+        self._head_ssh_port_cache: Dict[str, Tuple[float, int]] = {}
+        # Cache of non-terminated pods, keyed by label selector. Values are
+        # (listing time, {pod name: pod}) tuples. Invalidated whenever this
+        # provider creates, terminates or relabels pods.
+        self._pod_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # Cache of individual pods, keyed by pod name. Values are
+        # (read time, pod) tuples. Shared by the per-node accessors, which
+        # are often called back-to-back for the same node.
+        self._pod_read_cache: Dict[str, Tuple[float, Any]] = {}
+        # Cache of SSH credentials parsed from cluster YAMLs, keyed by
+        # cluster name with hash. Values are ((YAML inode, YAML modification
+        # time), credentials) tuples.
+        self._ssh_credentials_cache: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+
+    def _run_in_parallel(self, func, args):
+        """Runs func on args in parallel, capping the number of threads.
+
+        Returns:
+          A list of the return values of func, in the same order as args.
+        """
+        args = list(args)
+        if not args:
+            return []
+        num_threads = min(len(args), self.max_parallel_api_calls)
+        return subprocess_utils.run_in_parallel(func, args, num_threads)
+
     def non_terminated_nodes(self, tag_filters):
+        return list(self._non_terminated_pods(tag_filters))
+
+    def _non_terminated_pods(self, tag_filters, use_cache=True):
+        """Returns a dict mapping names of non-terminated pods to pods.
+
+        Args:
+          tag_filters: labels the pods must have.
+          use_cache: whether to reuse a listing from the last
+            NON_TERMINATED_PODS_CACHE_TTL seconds, and to serve a new listing
+            from the API server's watch cache. If False, the pods are listed
+            with a quorum read and the cache is refreshed.
+        """
+        tag_filters[TAG_RAY_CLUSTER_NAME] = self.cluster_name
+        label_selector = to_label_selector(tag_filters)
+        cached = self._pod_cache.get(label_selector)
+        if (use_cache and cached is not None and
+                time.time() - cached[0] < NON_TERMINATED_PODS_CACHE_TTL):
+            return cached[1]
+
         # Match pods that are in the 'Pending' or 'Running' phase.
         # Unfortunately there is no OR operator in field selectors, so we
         # have to match on NOT any of the other phases.
@@ -121,31 +336,49 @@ class KubernetesNodeProvider(NodeProvider):
             'status.phase!=Terminating',
         ])
 
-        tag_filters[TAG_RAY_CLUSTER_NAME] = self.cluster_name
-        label_selector = to_label_selector(tag_filters)
+        list_kwargs = {}
+        if use_cache:
+            list_kwargs['resource_version'] = LIST_FROM_CACHE_RESOURCE_VERSION
         pod_list = kubernetes.core_api().list_namespaced_pod(
             self.namespace,
             field_selector=field_selector,
-            label_selector=label_selector)
+            label_selector=label_selector,
+            **list_kwargs)
 
         # Don't return pods marked for deletion,
         # i.e. pods with non-null metadata.DeletionTimestamp.
-        return [
-            pod.metadata.name
+        pods = {
+            pod.metadata.name: pod
             for pod in pod_list.items
             if pod.metadata.deletion_timestamp is None
-        ]
+        }
+        now = time.time()
+        self._pod_cache[label_selector] = (now, pods)
+        # Callers usually query the listed nodes next, so seed the per-node
+        # cache as well.
+        for pod_name, pod in pods.items():
+            self._pod_read_cache[pod_name] = (now, pod)
+        return pods
+
+    def _read_pod(self, node_id):
+        """Reads a pod, reusing a read from the last POD_READ_CACHE_TTL s."""
+        cached = self._pod_read_cache.get(node_id)
+        if cached is not None and time.time() - cached[0] < POD_READ_CACHE_TTL:
+            return cached[1]
+        pod = kubernetes.core_api().read_namespaced_pod(node_id, self.namespace)
+        self._pod_read_cache[node_id] = (time.time(), pod)
+        return pod
 
     def is_running(self, node_id):
-        pod = kubernetes.core_api().read_namespaced_pod(node_id, self.namespace)
+        pod = self._read_pod(node_id)
         return pod.status.phase == 'Running'
 
     def is_terminated(self, node_id):
-        pod = kubernetes.core_api().read_namespaced_pod(node_id, self.namespace)
+        pod = self._read_pod(node_id)
         return pod.status.phase not in ['Running', 'Pending']
 
     def node_tags(self, node_id):
-        pod = kubernetes.core_api().read_namespaced_pod(node_id, self.namespace)
+        pod = self._read_pod(node_id)
         return pod.metadata.labels
 
     def external_ip(self, node_id):
@@ -155,13 +388,20 @@ class KubernetesNodeProvider(NodeProvider):
         # Extract the NodePort of the head node's SSH service
         # Node id is str e.g., example-cluster-head-v89lb
 
-        # TODO(romilb): Implement caching here for performance.
         # TODO(romilb): Multi-node would need more handling here.
         cluster_name = node_id.split('-head')[0]
-        return kubernetes_utils.get_head_ssh_port(cluster_name, self.namespace)
+        # The port is looked up once per node when building command runners,
+        # so cache it to avoid a service read for every node.
+        cached = self._head_ssh_port_cache.get(cluster_name)
+        if (cached is not None and
+                time.time() - cached[0] < HEAD_SSH_PORT_CACHE_TTL):
+            return cached[1]
+        port = kubernetes_utils.get_head_ssh_port(cluster_name, self.namespace)
+        self._head_ssh_port_cache[cluster_name] = (time.time(), port)
+        return port
 
     def internal_ip(self, node_id):
-        pod = kubernetes.core_api().read_namespaced_pod(node_id, self.namespace)
+        pod = self._read_pod(node_id)
         return pod.status.pod_ip
 
     def get_node_id(self, ip_address, use_internal_ip=True) -> str:
@@ -173,12 +413,18 @@ class KubernetesNodeProvider(NodeProvider):
                 return self._external_ip_cache.get(ip_address)
 
         if not find_node_id():
-            all_nodes = self.non_terminated_nodes({})
-            ip_func = self.internal_ip if use_internal_ip else self.external_ip
+            # A miss means the IP caches are stale, so the cached listing,
+            # which may predate the pod getting its IP, is not reused.
+            all_pods = self._non_terminated_pods({}, use_cache=False)
             ip_cache = (self._internal_ip_cache
                         if use_internal_ip else self._external_ip_cache)
-            for node_id in all_nodes:
-                ip_cache[ip_func(node_id)] = node_id
+            for node_id, pod in all_pods.items():
+                # Use the pod IP from the listing instead of reading each pod.
+                ip = (pod.status.pod_ip
+                      if use_internal_ip else self.external_ip(node_id))
+                # Pending pods have no IP yet.
+                if ip is not None:
+                    ip_cache[ip] = node_id
 
         if not find_node_id():
             if use_internal_ip:
@@ -224,20 +470,57 @@ class KubernetesNodeProvider(NodeProvider):
         return cluster_yaml_path
 
     def _set_node_tags(self, node_id, tags):
-        pod = kubernetes.core_api().read_namespaced_pod(node_id, self.namespace)
-        pod.metadata.labels.update(tags)
-        kubernetes.core_api().patch_namespaced_pod(node_id, self.namespace, pod)
+        # Send only the labels; the strategic merge patch merges them into
+        # the pod's existing labels, so the pod does not need to be read.
+        kubernetes.core_api().patch_namespaced_pod(
+            node_id, self.namespace, {'metadata': {
+                'labels': tags
+            }})
+        self._pod_read_cache.pop(node_id, None)
+        self._pod_cache.clear()
+
+    def _get_pods_by_name(self, pod_names):
+        """Returns a dict mapping each of the given pod names to its pod.
+
+        Pods belonging to this cluster are fetched with a single list call
+        instead of one read per pod. Pods not labeled with this cluster's
+        name (e.g., the SSH jump pod) are read individually.
+        """
+        label_selector = to_label_selector(
+            {TAG_RAY_CLUSTER_NAME: self.cluster_name})
+        pod_list = kubernetes.core_api().list_namespaced_pod(
+            self.namespace,
+            label_selector=label_selector,
+            resource_version=LIST_FROM_CACHE_RESOURCE_VERSION)
+        pods = {
+            pod.metadata.name: pod
+            for pod in pod_list.items
+            if pod.metadata.name in pod_names
+        }
+        for pod_name in pod_names:
+            if pod_name not in pods:
+                pods[pod_name] = kubernetes.core_api().read_namespaced_pod(
+                    pod_name, self.namespace)
+        return pods
 
-    def _raise_pod_scheduling_errors(self, new_nodes):
+    def _raise_pod_scheduling_errors(self, pods_by_name):
         """Raise pod scheduling failure reason.
 
         When a pod fails to schedule in Kubernetes, the reasons for the failure
         are recorded as events. This function retrieves those events and raises
         descriptive errors for better debugging and user feedback.
+
+        Args:
+          pods_by_name: dict mapping pod names to already fetched pods.
         """
-        for new_node in new_nodes:
-            pod = kubernetes.core_api().read_namespaced_pod(
-                new_node.metadata.name, self.namespace)
+        timeout_err_msg = ('Timed out while waiting for nodes to start. '
+                           'Cluster may be out of resources or '
+                           'may be too slow to autoscale.')
+        lack_resource_msg = (
+            'Insufficient {resource} capacity on the cluster. '
+            'Other SkyPilot tasks or pods may be using resources. '
+            'Check resource usage by running `kubectl describe nodes`.')
+        for pod in pods_by_name.values():
             pod_status = pod.status.phase
             # When there are multiple pods involved while launching instance,
             # there may be a single pod causing issue while others are
@@ -245,31 +528,21 @@ class KubernetesNodeProvider(NodeProvider):
             # the error message from the pod that is already scheduled.
             if pod_status != 'Pending':
                 continue
-            pod_name = pod._metadata._name
+            pod_name = pod.metadata.name
             events = kubernetes.core_api().list_namespaced_event(
                 self.namespace,
                 field_selector=(f'involvedObject.name={pod_name},'
-                                'involvedObject.kind=Pod'))
+                                'involvedObject.kind=Pod,'
+                                'reason=FailedScheduling'),
+                resource_version=LIST_FROM_CACHE_RESOURCE_VERSION)
             # Events created in the past hours are kept by
             # Kubernetes python client and we want to surface
             # the latest event message
-            events_desc_by_time = sorted(
-                events.items,
-                key=lambda e: e.metadata.creation_timestamp,
-                reverse=True)
-
-            event_message = None
-            for event in events_desc_by_time:
-                if event.reason == 'FailedScheduling':
-                    event_message = event.message
-                    break
-            timeout_err_msg = ('Timed out while waiting for nodes to start. '
-                               'Cluster may be out of resources or '
-                               'may be too slow to autoscale.')
-            lack_resource_msg = (
-                'Insufficient {resource} capacity on the cluster. '
-                'Other SkyPilot tasks or pods may be using resources. '
-                'Check resource usage by running `kubectl describe nodes`.')
+            latest_event = max(events.items,
+                               key=lambda e: e.metadata.creation_timestamp,
+                               default=None)
+            event_message = (latest_event.message
+                             if latest_event is not None else None)
             if event_message is not None:
                 if pod_status == 'Pending':
                     if 'Insufficient cpu' in event_message:
@@ -278,13 +551,9 @@ class KubernetesNodeProvider(NodeProvider):
                     if 'Insufficient memory' in event_message:
                         raise config.KubernetesError(
                             lack_resource_msg.format(resource='memory'))
-                    gpu_lf_keys = [
-                        lf.get_label_key()
-                        for lf in kubernetes_utils.LABEL_FORMATTER_REGISTRY
-                    ]
                     if pod.spec.node_selector:
                         for label_key in pod.spec.node_selector.keys():
-                            if label_key in gpu_lf_keys:
+                            if label_key in GPU_LABEL_KEYS:
                                 # TODO(romilb): We may have additional node
                                 #  affinity selectors in the future - in that
                                 #  case we will need to update this logic.
@@ -301,6 +570,109 @@ class KubernetesNodeProvider(NodeProvider):
                                              f'Details: \'{event_message}\' ')
         raise config.KubernetesError(f'{timeout_err_msg}')
 
+    def _watch_pods(self, pod_names, is_ready, timeout):
+        """Watches this cluster's pods until all given pods are ready.
+
+        Args:
+          pod_names: names of the pods to wait for. They must be labeled with
+            this cluster's name.
+          is_ready: function that takes a pod and returns whether it is ready.
+          timeout: seconds after which the API server closes the watch. The
+            client gives up slightly later, in case the connection was lost.
+
+        Returns:
+          True if all the pods became ready, False if the watch was closed
+          before that.
+
+        Raises:
+          _PodWatchError: if the watch failed or returned an error event.
+        """
+        pending = set(pod_names)
+        label_selector = to_label_selector(
+            {TAG_RAY_CLUSTER_NAME: self.cluster_name})
+        timeout_seconds = max(1, int(timeout))
+        pod_watch = kubernetes.watch().Watch()
+        try:
+            # Without a resource version, the watch starts with an ADDED
+            # event for every existing pod, so no update can be missed.
+            events = pod_watch.stream(kubernetes.core_api().list_namespaced_pod,
+                                      self.namespace,
+                                      label_selector=label_selector,
+                                      timeout_seconds=timeout_seconds,
+                                      _request_timeout=timeout_seconds +
+                                      POD_WATCH_CLIENT_TIMEOUT_MARGIN)
+            while True:
+                # Only failures of the watch itself are wrapped, so that
+                # errors raised by is_ready propagate to the caller.
+                try:
+                    event = next(events)
+                except StopIteration:
+                    break
+                except Exception as e:  # pylint: disable=broad-except
+                    raise _PodWatchError(
+                        common_utils.format_exception(e)) from e
+                if event['type'] == 'ERROR':
+                    raise _PodWatchError(
+                        f'Watch returned an error: {event["raw_object"]}')
+                if event['type'] == 'DELETED':
+                    continue
+                pod = event['object']
+                if pod.metadata.name in pending and is_ready(pod):
+                    pending.remove(pod.metadata.name)
+                    if not pending:
+                        return True
+        finally:
+            pod_watch.stop()
+        return False
+
+    def _wait_for_pods(self, pod_names, is_ready, timeout=None):
+        """Waits until all given pods are ready.
+
+        The pods are polled. While all pending pods are labeled with this
+        cluster's name, a watch is used to wait for updates between polls
+        instead of sleeping. If the watch fails, only polling is used.
+
+        Args:
+          pod_names: names of the pods to wait for.
+          is_ready: function that takes a pod and returns whether it is ready.
+          timeout: seconds to wait for. If None, waits indefinitely.
+
+        Returns:
+          True if all the pods became ready, False if the timeout was reached.
+        """
+        use_watch = True
+        delay = POD_POLL_INITIAL_DELAY
+        start_time = time.time()
+        while timeout is None or time.time() - start_time < timeout:
+            pods = self._get_pods_by_name(pod_names)
+            pending = [name for name in pod_names if not is_ready(pods[name])]
+            if not pending:
+                return True
+            # The watch only covers pods labeled with this cluster's name,
+            # e.g., not the SSH jump pod, which is shared across clusters.
+            pending_labels = [
+                pods[name].metadata.labels or {} for name in pending
+            ]
+            watchable = all(
+                labels.get(TAG_RAY_CLUSTER_NAME) == self.cluster_name
+                for labels in pending_labels)
+            if use_watch and watchable:
+                if timeout is None:
+                    watch_timeout = POD_WATCH_TIMEOUT
+                else:
+                    watch_timeout = timeout - (time.time() - start_time)
+                try:
+                    if self._watch_pods(pending, is_ready, watch_timeout):
+                        return True
+                except _PodWatchError as e:
+                    logger.warning(config.log_prefix +
+                                   'Failed to watch pods, falling back to '
+                                   f'polling. Error: {e}')
+                    use_watch = False
+            time.sleep(delay)
+            delay = min(delay * 2, POD_POLL_MAX_DELAY)
+        return False
+
     def _wait_for_pods_to_schedule(self, new_nodes_with_jump_pod):
         """Wait for all pods to be scheduled.
 
@@ -309,27 +681,14 @@ class KubernetesNodeProvider(NodeProvider):
         is ContainerCreating, then we can assume that resources have been
         allocated and we can exit.
         """
-        start_time = time.time()
-        while time.time() - start_time < self.timeout:
-            all_pods_scheduled = True
-            for node in new_nodes_with_jump_pod:
-                # Iterate over each pod to check their status
-                pod = kubernetes.core_api().read_namespaced_pod(
-                    node.metadata.name, self.namespace)
-                if pod.status.phase == 'Pending':
-                    # If container_statuses is None, then the pod hasn't
-                    # been scheduled yet.
-                    if pod.status.container_statuses is None:
-                        all_pods_scheduled = False
-                        break
-
-            if all_pods_scheduled:
-                return
-            time.sleep(1)
+        node_names = [node.metadata.name for node in new_nodes_with_jump_pod]
+        if self._wait_for_pods(node_names, _is_pod_scheduled, self.timeout):
+            return
 
         # Handle pod scheduling errors
         try:
-            self._raise_pod_scheduling_errors(new_nodes_with_jump_pod)
+            self._raise_pod_scheduling_errors(
+                self._get_pods_by_name(node_names))
         except config.KubernetesError:
             raise
         except Exception as e:
@@ -344,148 +703,91 @@ class KubernetesNodeProvider(NodeProvider):
         Pods may be pulling images or may be in the process of container
         creation.
         """
-        while True:
-            all_pods_running = True
-            # Iterate over each pod to check their status
-            for node in new_nodes_with_jump_pod:
-                pod = kubernetes.core_api().read_namespaced_pod(
-                    node.metadata.name, self.namespace)
-
-                # Continue if pod and all the containers within the
-                # pod are succesfully created and running.
-                if pod.status.phase == 'Running' and all([
-                        container.state.running
-                        for container in pod.status.container_statuses
-                ]):
-                    continue
+        node_names = [node.metadata.name for node in new_nodes_with_jump_pod]
+        self._wait_for_pods(node_names, _is_pod_running)
+
+    def _run_command_on_all_pods(self, new_nodes, command):
+        """Runs a command on all given pods in parallel.
+
+        Returns:
+          A list of the command outputs, in the same order as new_nodes.
+        """
+
+        def _run_command(new_node):
+            return run_command_on_pods(new_node.metadata.name, self.namespace,
+                                       command)
 
-                all_pods_running = False
-                if pod.status.phase == 'Pending':
-                    # Iterate over each container in pod to check their status
-                    for container_status in pod.status.container_statuses:
-                        # If the container wasn't in 'ContainerCreating'
-                        # state, then we know pod wasn't scheduled or
-                        # had some other error, such as image pull error.
-                        # See list of possible reasons for waiting here:
-                        # https://stackoverflow.com/a/57886025
-                        waiting = container_status.state.waiting
-                        if waiting is not None and waiting.reason != 'ContainerCreating':
-                            raise config.KubernetesError(
-                                'Failed to create container while launching '
-                                'the node. Error details: '
-                                f'{container_status.state.waiting.message}.')
-                # Reaching this point means that one of the pods had an issue,
-                # so break out of the loop
-                break
-
-            if all_pods_running:
-                break
-            time.sleep(1)
-
-    def _check_user_privilege(self, new_nodes):
-        # Checks if the default user has sufficient privilege to set up
-        # the kubernetes instance pod.
-        check_k8s_user_sudo_cmd = [
-            '/bin/sh',
-            '-c',
-            (
-                'if [ $(id -u) -eq 0 ]; then'
-                # If user is root, create an alias for sudo used in skypilot setup
-                '  echo \'alias sudo=""\' >> ~/.bashrc; '
-                'else '
-                '  if command -v sudo >/dev/null 2>&1; then '
-                '    timeout 2 sudo -l >/dev/null 2>&1 || '
-                f'    ( echo {exceptions.INSUFFICIENT_PRIVILEGES_CODE!r}; ); '
-                '  else '
-                f'    ( echo {exceptions.INSUFFICIENT_PRIVILEGES_CODE!r}; ); '
-                '  fi; '
-                'fi')
-        ]
-
-        for new_node in new_nodes:
-            privilege_check = run_command_on_pods(new_node.metadata.name,
-                                                  self.namespace,
-                                                  check_k8s_user_sudo_cmd)
-            if privilege_check == str(exceptions.INSUFFICIENT_PRIVILEGES_CODE):
+        return self._run_in_parallel(_run_command, new_nodes)
+
+    def _setup_pods(self, new_nodes, cluster_name_with_hash):
+        """Sets up the pods with two execs per pod.
+
+        The privilege check, environment variable setup and ssh user lookup
+        are combined into one short script, so that each pod pays the exec
+        handshake once for them. The script prints markers that are parsed
+        from its output to surface the privilege check result and the ssh
+        user. The slower SSH setup then runs in a separate exec.
+
+        Environment variables: Kubernetes automatically populates containers
+        with critical environment variables, such as those for discovering
+        services running in the cluster and CUDA/nvidia environment variables.
+        We need to make sure these env vars are available in every task and
+        ssh session. This is needed for GPU support and service discovery.
+        See https://github.com/skypilot-org/skypilot/issues/2287 for
+        more details. To do so, we capture env vars from the pod's runtime and
+        write them to /etc/profile.d/, making them available for all users in
+        future shell sessions.
+        """
+        outputs = self._run_command_on_all_pods(new_nodes,
+                                                CONFIGURE_K8S_POD_CMD)
+        for output in outputs:
+            if INSUFFICIENT_PRIVILEGES_OUTPUT in output:
                 raise config.KubernetesError(
                     'Insufficient system privileges detected. '
                     'Ensure the default user has root access or '
                     '"sudo" is installed and the user is added to the sudoers '
                     'from the image.')
-
-    def _setup_ssh_in_pods(self, new_nodes):
-        # Setting up ssh for the pod instance. This is already setup for
-        # the jump pod so it does not need to be run for it.
-        set_k8s_ssh_cmd = [
-            '/bin/sh', '-c',
-            ('prefix_cmd() { if [ $(id -u) -ne 0 ]; then echo "sudo"; else echo ""; fi; }; '
-             'export DEBIAN_FRONTEND=noninteractive;'
-             '$(prefix_cmd) apt-get update;'
-             '$(prefix_cmd) apt install openssh-server rsync -y; '
-             '$(prefix_cmd) mkdir -p /var/run/sshd; '
-             '$(prefix_cmd) sed -i "s/PermitRootLogin prohibit-password/PermitRootLogin yes/" /etc/ssh/sshd_config; '
-             '$(prefix_cmd) sed "s@session\\s*required\\s*pam_loginuid.so@session optional pam_loginuid.so@g" -i /etc/pam.d/sshd; '
-             'cd /etc/ssh/ && $(prefix_cmd) ssh-keygen -A; '
-             '$(prefix_cmd) mkdir -p ~/.ssh; '
-             '$(prefix_cmd) cat /etc/secret-volume/ssh-publickey* > ~/.ssh/authorized_keys; '
-             '$(prefix_cmd) service ssh restart')
-        ]
+        # All pods run the same image, so they share the same ssh user.
+        ssh_user = parse_ssh_user(outputs[-1])
 
         # TODO(romilb): We need logging and surface errors here.
-        for new_node in new_nodes:
-            run_command_on_pods(new_node.metadata.name, self.namespace,
-                                set_k8s_ssh_cmd)
-
-    def _set_env_vars_in_pods(self, new_nodes):
-        """Setting environment variables in pods.
-
-        Once all containers are ready, we can exec into them and set env vars.
-        Kubernetes automatically populates containers with critical
-        environment variables, such as those for discovering services running
-        in the cluster and CUDA/nvidia environment variables. We need to
-        make sure these env vars are available in every task and ssh session.
-        This is needed for GPU support and service discovery.
-        See https://github.com/skypilot-org/skypilot/issues/2287 for
-        more details.
-
-        To do so, we capture env vars from the pod's runtime and write them to
-        /etc/profile.d/, making them available for all users in future
-        shell sessions.
-        """
-        set_k8s_env_var_cmd = [
-            '/bin/sh', '-c',
-            ('prefix_cmd() { if [ $(id -u) -ne 0 ]; then echo "sudo"; else echo ""; fi; } && '
-             'printenv | awk -F "=" \'{print "export " $1 "=\\047" $2 "\\047"}\' > ~/k8s_env_var.sh && '
-             'mv ~/k8s_env_var.sh /etc/profile.d/k8s_env_var.sh || '
-             '$(prefix_cmd) mv ~/k8s_env_var.sh /etc/profile.d/k8s_env_var.sh')
-        ]
-
-        for new_node in new_nodes:
-            run_command_on_pods(new_node.metadata.name, self.namespace,
-                                set_k8s_env_var_cmd)
-
-    def _update_ssh_user_config(self, new_nodes, cluster_name_with_hash):
-        get_k8s_ssh_user_cmd = ['/bin/sh', '-c', ('echo $(whoami)')]
-        for new_node in new_nodes:
-            ssh_user = run_command_on_pods(new_node.metadata.name,
-                                           self.namespace, get_k8s_ssh_user_cmd)
+        self._run_command_on_all_pods(new_nodes, INSTALL_K8S_SSH_CMD)
+        self._update_ssh_user_config(ssh_user, cluster_name_with_hash)
 
+    def _update_ssh_user_config(self, ssh_user, cluster_name_with_hash):
         cluster_yaml_path = self._recover_cluster_yaml_path(
             cluster_name_with_hash)
-        with open(cluster_yaml_path, 'r') as f:
-            content = f.read()
 
         # Replacing the default ssh user name with the actual user name.
         # This updates user name specified in user's custom image if it's used.
-        content = re.sub(r'ssh_user: \w+', f'ssh_user: {ssh_user}', content)
-
-        with open(cluster_yaml_path, 'w') as f:
-            f.write(content)
+        # The YAML is streamed line by line into a unique temporary file next
+        # to it, rewriting only the ssh_user lines, and the temporary file then
+        # replaces the original. Concurrent writers thus cannot clobber each
+        # other's partial output and readers never see a truncated file.
+        ssh_user_re = re.compile(f'ssh_user: {SSH_USER_PATTERN}')
+        fd, tmp_yaml_path = tempfile.mkstemp(
+            dir=os.path.dirname(cluster_yaml_path))
+        try:
+            with os.fdopen(fd, 'w') as f_out, open(cluster_yaml_path,
+                                                   'r') as f_in:
+                for line in f_in:
+                    if line.lstrip().startswith('ssh_user:'):
+                        line = ssh_user_re.sub(f'ssh_user: {ssh_user}', line)
+                    f_out.write(line)
+            # mkstemp creates the file with mode 0600.
+            shutil.copymode(cluster_yaml_path, tmp_yaml_path)
+            os.replace(tmp_yaml_path, cluster_yaml_path)
+        except Exception:
+            os.remove(tmp_yaml_path)
+            raise
 
     def create_node(self, node_config, tags, count):
-        conf = copy.deepcopy(node_config)
-        pod_spec = conf.get('pod', conf)
-        service_spec = conf.get('service')
+        # Only the pod metadata is modified here (the service spec is copied
+        # per service below), so avoid deep-copying the whole node config,
+        # which may contain large container specs.
+        pod_spec = dict(node_config.get('pod', node_config))
+        pod_spec['metadata'] = copy.deepcopy(pod_spec['metadata'])
+        service_spec = node_config.get('service')
         node_uuid = str(uuid4())
         tags[TAG_RAY_CLUSTER_NAME] = self.cluster_name
         tags['ray-node-uuid'] = node_uuid
@@ -502,29 +804,36 @@ class KubernetesNodeProvider(NodeProvider):
 
         logger.info(config.log_prefix +
                     'calling create_namespaced_pod (count={}).'.format(count))
-        new_nodes = []
-        for _ in range(count):
-            pod = kubernetes.core_api().create_namespaced_pod(
+
+        def _create_pod(_):
+            return kubernetes.core_api().create_namespaced_pod(
                 self.namespace, pod_spec)
-            new_nodes.append(pod)
+
+        new_nodes = self._run_in_parallel(_create_pod, range(count))
+        self._pod_cache.clear()
 
         new_svcs = []
         if service_spec is not None:
             logger.info(config.log_prefix + 'calling create_namespaced_service '
                         '(count={}).'.format(count))
 
-            for new_node in new_nodes:
-                metadata = service_spec.get('metadata', {})
+            def _create_service(new_node):
+                # Each service is named after its pod, so give every call its
+                # own copy of the spec.
+                svc_spec = copy.deepcopy(service_spec)
+                metadata = svc_spec.get('metadata', {})
                 metadata['name'] = new_node.metadata.name
-                service_spec['metadata'] = metadata
-                service_spec['spec']['selector'] = {'ray-node-uuid': node_uuid}
-                svc = kubernetes.core_api().create_namespaced_service(
-                    self.namespace, service_spec)
-                new_svcs.append(svc)
+                svc_spec['metadata'] = metadata
+                svc_spec['spec']['selector'] = {'ray-node-uuid': node_uuid}
+                return kubernetes.core_api().create_namespaced_service(
+                    self.namespace, svc_spec)
+
+            new_svcs = self._run_in_parallel(_create_service, new_nodes)
 
         # Adding the jump pod to the new_nodes list as well so it can be
         # checked if it's scheduled and running along with other pod instances.
-        ssh_jump_pod_name = conf['metadata']['labels']['skypilot-ssh-jump']
+        ssh_jump_pod_name = node_config['metadata']['labels'][
+            'skypilot-ssh-jump']
         new_nodes_with_jump_pod = new_nodes[:]
         jump_pod = kubernetes.core_api().read_namespaced_pod(
             ssh_jump_pod_name, self.namespace)
@@ -541,20 +850,16 @@ class KubernetesNodeProvider(NodeProvider):
         logger.info(config.log_prefix +
                     f'Waiting for pods to run. Pods: {node_names}')
         self._wait_for_pods_to_run(new_nodes_with_jump_pod)
+        cluster_name_with_hash = node_config['metadata']['labels'][
+            'skypilot-cluster']
         logger.info(config.log_prefix +
-                    f'Checking if user in image has sufficient privileges.')
-        self._check_user_privilege(new_nodes)
-        logger.info(config.log_prefix + f'Setting up SSH in pod.')
-        self._setup_ssh_in_pods(new_nodes)
-        logger.info(config.log_prefix +
-                    f'Setting up environment variables in pod.')
-        self._set_env_vars_in_pods(new_nodes)
-        cluster_name_with_hash = conf['metadata']['labels']['skypilot-cluster']
-        logger.info(config.log_prefix + f'Fetching and updating ssh username.')
-        self._update_ssh_user_config(new_nodes, cluster_name_with_hash)
+                    'Checking user privileges, setting up SSH and environment '
+                    'variables, and updating ssh username in pods.')
+        self._setup_pods(new_nodes, cluster_name_with_hash)
 
     def terminate_node(self, node_id):
         logger.info(config.log_prefix + 'calling delete_namespaced_pod')
+        self._head_ssh_port_cache.pop(node_id.split('-head')[0], None)
         try:
             kubernetes_utils.clean_zombie_ssh_jump_pod(self.namespace, node_id)
         except Exception as e:
@@ -586,13 +891,17 @@ class KubernetesNodeProvider(NodeProvider):
                                ' but the pod was not found (404).')
             else:
                 raise
+        finally:
+            # Invalidate after the deletion, so that a listing taken while
+            # the pod was being deleted is not reused.
+            self._pod_cache.clear()
+            self._pod_read_cache.pop(node_id, None)
 
     def terminate_nodes(self, node_ids):
-        # TODO(romilb): terminate_nodes should be include optimizations for
-        #  deletion of multiple nodes. Currently, it deletes one node at a time.
-        #  We should look in to using deletecollection here for batch deletion.
-        for node_id in node_ids:
-            self.terminate_node(node_id)
+        # Nodes are terminated in parallel rather than with deletecollection,
+        # since terminate_node also cleans up the SSH jump pod and deletes
+        # each node's services before its pod.
+        self._run_in_parallel(self.terminate_node, node_ids)
 
     def get_command_runner(self,
                            log_prefix,
@@ -624,10 +933,22 @@ class KubernetesNodeProvider(NodeProvider):
         # 'create_node()' process in _update_ssh_user_config.
         # Since the node provider is initialized with stale auth information,
         # we need to reload the updated user from YAML.
+        # The parsed credentials are cached until the YAML is modified. The
+        # inode is checked as well, since _update_ssh_user_config replaces
+        # the file, and two writes may share an mtime on filesystems with
+        # coarse timestamps.
         cluster_yaml_path = self._recover_cluster_yaml_path(
             cluster_name_with_hash)
-        ssh_credentials = backend_utils.ssh_credential_from_yaml(
-            cluster_yaml_path)
+        yaml_stat = os.stat(cluster_yaml_path)
+        yaml_version = (yaml_stat.st_ino, yaml_stat.st_mtime_ns)
+        cached = self._ssh_credentials_cache.get(cluster_name_with_hash)
+        if cached is not None and cached[0] == yaml_version:
+            ssh_credentials = cached[1]
+        else:
+            ssh_credentials = backend_utils.ssh_credential_from_yaml(
+                cluster_yaml_path)
+            self._ssh_credentials_cache[cluster_name_with_hash] = (
+                yaml_version, ssh_credentials)
         auth_config['ssh_user'] = ssh_credentials['ssh_user']
 
         common_args = {
@@ -50,17 +50,27 @@ def get_parallel_threads() -> int:
     return max(4, cpu_count - 1)
 
 
-def run_in_parallel(func: Callable, args: Iterable[Any]) -> List[Any]:
+def run_in_parallel(func: Callable,
+                    args: Iterable[Any],
+                    num_threads: Optional[int] = None) -> List[Any]:
     """Run a function in parallel on a list of arguments.
 
     The function 'func' should raise a CommandError if the command fails.
 
+    Args:
+      func: The function to run.
+      args: The arguments to run the function on.
+      num_threads: The number of threads to use. Defaults to
+        get_parallel_threads().
+
     Returns:
       A list of the return values of the function func, in the same order as the
       arguments.
     """
+    if num_threads is None:
+        num_threads = get_parallel_threads()
     # Reference: https://stackoverflow.com/questions/25790279/python-multiprocessing-early-termination # pylint: disable=line-too-long
-    with pool.ThreadPool(processes=get_parallel_threads()) as p:
+    with pool.ThreadPool(processes=num_threads) as p:
         # Run the function in parallel on the arguments, keeping the order.
         return list(p.imap(func, args))
 
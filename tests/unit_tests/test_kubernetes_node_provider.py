@@ -0,0 +1,427 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from sky.adaptors import kubernetes
+from sky.skylet.providers.kubernetes import config
+from sky.skylet.providers.kubernetes import node_provider
+
+CLUSTER_NAME = 'test-cluster'
+CLUSTER_LABELS = {node_provider.TAG_RAY_CLUSTER_NAME: CLUSTER_NAME}
+
+
+def _make_pod(name,
+              phase='Pending',
+              running=False,
+              waiting_reason=None,
+              labels=None):
+    if running:
+        state = SimpleNamespace(running=True, waiting=None)
+    elif waiting_reason is not None:
+        state = SimpleNamespace(running=None,
+                                waiting=SimpleNamespace(
+                                    reason=waiting_reason,
+                                    message=f'{waiting_reason} message'))
+    else:
+        state = None
+    container_statuses = None if state is None else [
+        SimpleNamespace(state=state)
+    ]
+    return SimpleNamespace(metadata=SimpleNamespace(
+        name=name,
+        labels=CLUSTER_LABELS if labels is None else labels,
+        deletion_timestamp=None),
+                           status=SimpleNamespace(
+                               phase=phase,
+                               container_statuses=container_statuses))
+
+
+class _FakeCoreApi:
+    """Serves pod listings from a list of snapshots, one per call."""
+
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.list_calls = 0
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        del namespace, kwargs  # Unused.
+        index = min(self.list_calls, len(self.snapshots) - 1)
+        self.list_calls += 1
+        return SimpleNamespace(items=self.snapshots[index])
+
+    def read_namespaced_pod(self, name, namespace):
+        del namespace  # Unused.
+        index = min(self.list_calls, len(self.snapshots)) - 1
+        return next(
+            pod for pod in self.snapshots[index] if pod.metadata.name == name)
+
+
+class _FakeWatch:
+    """Yields the given events, then raises the given error, if any."""
+
+    def __init__(self, events=(), error=None):
+        self.events = events
+        self.error = error
+        self.stream_calls = 0
+        self.stopped = False
+
+    def stream(self, func, namespace, **kwargs):
+        del func, namespace, kwargs  # Unused.
+        self.stream_calls += 1
+        yield from self.events
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.setattr(node_provider.time, 'sleep', lambda _: None)
+    return node_provider.KubernetesNodeProvider(
+        {
+            'namespace': 'default',
+            'timeout': 10
+        }, CLUSTER_NAME)
+
+
+def _use_fakes(monkeypatch, core_api, pod_watch):
+    monkeypatch.setattr(kubernetes, 'core_api', lambda: core_api)
+    monkeypatch.setattr(kubernetes, 'watch',
+                        lambda: SimpleNamespace(Watch=lambda: pod_watch))
+
+
+def test_parse_ssh_user():
+    output = (f'Reading package lists...\n'
+              f'{node_provider.SSH_USER_MARKER}ubuntu\n')
+    assert node_provider.parse_ssh_user(output) == 'ubuntu'
+
+
+def test_parse_ssh_user_output_cut_off_before_marker():
+    # The exec returns whatever output arrived before the API timeout.
+    output = ('Get:1 http://archive.ubuntu.com/ubuntu jammy InRelease\n'
+              'Reading package lists...')
+    with pytest.raises(config.KubernetesError):
+        node_provider.parse_ssh_user(output)
+
+
+@pytest.mark.parametrize('ssh_user', ['ec2-user', 'first.last', '_svc'])
+def test_parse_ssh_user_with_punctuation(ssh_user):
+    output = f'{node_provider.SSH_USER_MARKER}{ssh_user}\n'
+    assert node_provider.parse_ssh_user(output) == ssh_user
+
+
+def test_parse_ssh_user_invalid_user():
+    output = f'{node_provider.SSH_USER_MARKER}ubuntu: not found\n'
+    with pytest.raises(config.KubernetesError):
+        node_provider.parse_ssh_user(output)
+
+
+def test_update_ssh_user_config_keeps_file_mode(tmp_path, monkeypatch):
+    cluster_yaml_path = tmp_path / 'cluster.yml'
+    cluster_yaml_path.write_text('auth:\n  ssh_user: sky\n')
+    cluster_yaml_path.chmod(0o644)
+    provider = node_provider.KubernetesNodeProvider.__new__(
+        node_provider.KubernetesNodeProvider)
+    monkeypatch.setattr(provider, '_recover_cluster_yaml_path',
+                        lambda _: str(cluster_yaml_path))
+
+    provider._update_ssh_user_config('ubuntu', 'cluster-abcd')
+
+    assert cluster_yaml_path.read_text() == 'auth:\n  ssh_user: ubuntu\n'
+    assert cluster_yaml_path.stat().st_mode & 0o777 == 0o644
+    assert [p.name for p in tmp_path.iterdir()] == ['cluster.yml']
+
+
+def test_update_ssh_user_config_replaces_hyphenated_user(tmp_path, monkeypatch):
+    cluster_yaml_path = tmp_path / 'cluster.yml'
+    cluster_yaml_path.write_text('auth:\n  ssh_user: ec2-user\n')
+    provider = node_provider.KubernetesNodeProvider.__new__(
+        node_provider.KubernetesNodeProvider)
+    monkeypatch.setattr(provider, '_recover_cluster_yaml_path',
+                        lambda _: str(cluster_yaml_path))
+
+    provider._update_ssh_user_config('ubuntu', 'cluster-abcd')
+
+    assert cluster_yaml_path.read_text() == 'auth:\n  ssh_user: ubuntu\n'
+
+
+def test_wait_for_pods_returns_when_watch_sees_all_pods_ready(
+        provider, monkeypatch):
+    core_api = _FakeCoreApi([[_make_pod('head'), _make_pod('worker')]])
+    pod_watch = _FakeWatch(events=[
+        {
+            'type': 'MODIFIED',
+            'object': _make_pod('head', phase='Running', running=True)
+        },
+        {
+            'type': 'MODIFIED',
+            'object': _make_pod('worker', phase='Running', running=True)
+        },
+    ])
+    _use_fakes(monkeypatch, core_api, pod_watch)
+
+    assert provider._wait_for_pods(['head', 'worker'],
+                                   node_provider._is_pod_running,
+                                   timeout=10)
+    assert core_api.list_calls == 1
+    assert pod_watch.stream_calls == 1
+    assert pod_watch.stopped
+
+
+@pytest.mark.parametrize('pod_watch', [
+    _FakeWatch(events=[{
+        'type': 'ERROR',
+        'raw_object': {
+            'code': 410
+        }
+    }]),
+    _FakeWatch(error=OSError('connection reset')),
+])
+def test_wait_for_pods_falls_back_to_polling_on_watch_failure(
+        provider, monkeypatch, pod_watch):
+    core_api = _FakeCoreApi([
+        [_make_pod('head')],
+        [_make_pod('head', phase='Running', running=True)],
+    ])
+    _use_fakes(monkeypatch, core_api, pod_watch)
+
+    assert provider._wait_for_pods(['head'],
+                                   node_provider._is_pod_running,
+                                   timeout=10)
+    assert core_api.list_calls == 2
+    assert pod_watch.stream_calls == 1
+
+
+def test_wait_for_pods_propagates_errors_from_watched_pods(
+        provider, monkeypatch):
+    core_api = _FakeCoreApi([[_make_pod('head')]])
+    pod_watch = _FakeWatch(events=[{
+        'type': 'MODIFIED',
+        'object': _make_pod('head', waiting_reason='ErrImagePull')
+    }])
+    _use_fakes(monkeypatch, core_api, pod_watch)
+
+    with pytest.raises(config.KubernetesError, match='ErrImagePull message'):
+        provider._wait_for_pods(['head'],
+                                node_provider._is_pod_running,
+                                timeout=10)
+    assert core_api.list_calls == 1
+
+
+def test_wait_for_pods_polls_unlabeled_pods(provider, monkeypatch):
+    core_api = _FakeCoreApi([
+        [_make_pod('jump', labels={})],
+        [_make_pod('jump', phase='Running', running=True, labels={})],
+    ])
+    pod_watch = _FakeWatch()
+    _use_fakes(monkeypatch, core_api, pod_watch)
+
+    assert provider._wait_for_pods(['jump'],
+                                   node_provider._is_pod_running,
+                                   timeout=10)
+    assert pod_watch.stream_calls == 0
+
+
+def test_wait_for_pods_returns_false_on_timeout(provider, monkeypatch):
+    core_api = _FakeCoreApi([[_make_pod('head')]])
+    pod_watch = _FakeWatch()
+    _use_fakes(monkeypatch, core_api, pod_watch)
+
+    assert not provider._wait_for_pods(
+        ['head'], node_provider._is_pod_running, timeout=0.1)
+    assert pod_watch.stream_calls >= 1
+
+
+def test_is_pod_running_for_unscheduled_pod():
+    assert not node_provider._is_pod_running(_make_pod('head'))
+
+
+class _FakePodApi:
+    """Keeps pods in memory and records the list and read calls."""
+
+    def __init__(self, pods):
+        self.pods = {pod.metadata.name: pod for pod in pods}
+        self.list_kwargs = []
+        self.read_calls = 0
+
+    def list_namespaced_pod(self, namespace, **kwargs):
+        del namespace  # Unused.
+        self.list_kwargs.append(kwargs)
+        selector = dict(
+            label.split('=') for label in kwargs['label_selector'].split(','))
+        return SimpleNamespace(items=[
+            pod for pod in self.pods.values()
+            if selector.items() <= (pod.metadata.labels or {}).items()
+        ])
+
+    def read_namespaced_pod(self, name, namespace):
+        del namespace  # Unused.
+        self.read_calls += 1
+        return self.pods[name]
+
+    def create_namespaced_pod(self, namespace, body):
+        del namespace  # Unused.
+        pod = _make_pod(f'pod-{len(self.pods)}',
+                        labels=body['metadata']['labels'])
+        self.pods[pod.metadata.name] = pod
+        return pod
+
+    def patch_namespaced_pod(self, name, namespace, body):
+        del namespace  # Unused.
+        self.pods[name].metadata.labels = body['metadata']['labels']
+
+    def delete_namespaced_service(self, name, namespace, **kwargs):
+        del name, namespace, kwargs  # Unused.
+
+    def delete_namespaced_pod(self, name, namespace, **kwargs):
+        del namespace, kwargs  # Unused.
+        del self.pods[name]
+
+
+@pytest.fixture
+def pod_api(monkeypatch):
+    api = _FakePodApi([_make_pod('head')])
+    monkeypatch.setattr(kubernetes, 'core_api', lambda: api)
+    return api
+
+
+def test_non_terminated_nodes_reuses_listing(provider, pod_api):
+    assert provider.non_terminated_nodes({}) == ['head']
+    assert provider.non_terminated_nodes({}) == ['head']
+    assert provider.node_tags('head') == CLUSTER_LABELS
+    assert len(pod_api.list_kwargs) == 1
+    assert pod_api.read_calls == 0
+
+
+def test_get_node_id_relists_pods_on_miss(provider, pod_api):
+    # The cached listing was taken while the pod had no IP yet.
+    pod_api.pods['head'].status.pod_ip = None
+    provider.non_terminated_nodes({})
+    pod_api.pods['head'] = _make_pod('head', phase='Running', running=True)
+    pod_api.pods['head'].status.pod_ip = '10.0.0.1'
+
+    assert provider.get_node_id('10.0.0.1') == 'head'
+    assert None not in provider._internal_ip_cache
+    # The listing is redone with a quorum read, not from the watch cache.
+    assert len(pod_api.list_kwargs) == 2
+    assert 'resource_version' not in pod_api.list_kwargs[-1]
+
+
+def test_set_node_tags_invalidates_pod_caches(provider, pod_api):
+    provider.non_terminated_nodes({})
+    provider.set_node_tags('head', {**CLUSTER_LABELS, 'tag': 'new'})
+
+    assert provider.node_tags('head')['tag'] == 'new'
+    assert pod_api.read_calls == 1
+    provider.non_terminated_nodes({})
+    assert len(pod_api.list_kwargs) == 2
+
+
+def test_terminate_node_invalidates_pod_caches(provider, pod_api, monkeypatch):
+    monkeypatch.setattr(node_provider.kubernetes_utils,
+                        'clean_zombie_ssh_jump_pod', lambda *args: None)
+    provider.non_terminated_nodes({})
+    provider.terminate_node('head')
+
+    assert provider.non_terminated_nodes({}) == []
+    assert 'head' not in provider._pod_read_cache
+
+
+def test_create_node_invalidates_pod_cache(provider, pod_api, monkeypatch):
+    pod_api.pods['jump'] = _make_pod('jump', labels={})
+    for method in [
+            '_wait_for_pods_to_schedule', '_wait_for_pods_to_run', '_setup_pods'
+    ]:
+        monkeypatch.setattr(provider, method, lambda *args: None)
+    assert provider.non_terminated_nodes({}) == ['head']
+    node_config = {
+        'metadata': {
+            'labels': {
+                'skypilot-ssh-jump': 'jump',
+                'skypilot-cluster': f'{CLUSTER_NAME}-abcd'
+            }
+        }
+    }
+    provider.create_node(node_config,
+                         {node_provider.TAG_RAY_NODE_KIND: 'worker'},
+                         count=1)
+
+    assert sorted(provider.non_terminated_nodes({})) == ['head', 'pod-2']
+
+
+@pytest.mark.parametrize('provider_config, expected', [
+    ({}, node_provider.DEFAULT_MAX_PARALLEL_API_CALLS),
+    ({
+        'max_parallel_api_calls': 4
+    }, 4),
+    ({
+        'max_parallel_api_calls': 1000
+    }, kubernetes.CONNECTION_POOL_MAXSIZE),
+])
+def test_max_parallel_api_calls(provider_config, expected):
+    provider = node_provider.KubernetesNodeProvider(
+        {
+            'namespace': 'default',
+            'timeout': 10,
+            **provider_config
+        }, CLUSTER_NAME)
+    assert provider.max_parallel_api_calls == expected
+
+
+def test_run_in_parallel_caps_threads(provider, monkeypatch):
+    num_threads = []
+
+    def _run_in_parallel(func, args, threads):
+        num_threads.append(threads)
+        return [func(arg) for arg in args]
+
+    monkeypatch.setattr(node_provider.subprocess_utils, 'run_in_parallel',
+                        _run_in_parallel)
+    assert provider._run_in_parallel(str, range(3)) == ['0', '1', '2']
+    assert provider._run_in_parallel(
+        str, range(100)) == [str(i) for i in range(100)]
+    assert provider._run_in_parallel(str, []) == []
+    assert num_threads == [3, node_provider.DEFAULT_MAX_PARALLEL_API_CALLS]
+
+
+def test_get_command_runner_reloads_replaced_yaml(provider, tmp_path,
+                                                  monkeypatch):
+    cluster_yaml_path = tmp_path / 'cluster.yml'
+    cluster_yaml_path.write_text('auth:\n  ssh_user: sky\n')
+    monkeypatch.setattr(provider, '_recover_cluster_yaml_path',
+                        lambda _: str(cluster_yaml_path))
+    num_loads = []
+
+    def _ssh_credential_from_yaml(path):
+        num_loads.append(path)
+        with open(path, 'r') as f:
+            return {'ssh_user': f.read().split('ssh_user: ')[1].strip()}
+
+    monkeypatch.setattr(node_provider.backend_utils, 'ssh_credential_from_yaml',
+                        _ssh_credential_from_yaml)
+    monkeypatch.setattr(
+        node_provider, 'SSHCommandRunner',
+        lambda **kwargs: SimpleNamespace(set_port=lambda port: None))
+
+    def _get_ssh_user():
+        auth_config = {}
+        provider.get_command_runner('', 'head', auth_config, 'cluster-abcd',
+                                    None, True)
+        return auth_config['ssh_user']
+
+    assert _get_ssh_user() == 'sky'
+    assert _get_ssh_user() == 'sky'
+    assert len(num_loads) == 1
+
+    # Emulate a filesystem with coarse timestamps, where the replaced YAML
+    # keeps the modification time of the original.
+    mtime_ns = cluster_yaml_path.stat().st_mtime_ns
+    provider._update_ssh_user_config('ubuntu', 'cluster-abcd')
+    os.utime(cluster_yaml_path, ns=(mtime_ns, mtime_ns))
+
+    assert _get_ssh_user() == 'ubuntu'
+    assert len(num_loads) == 2
+    assert list(provider._ssh_credentials_cache) == ['cluster-abcd']